@@ -24,19 +24,38 @@
 
 from __future__ import annotations
 
+import collections
 import colorsys
-import copy
+import concurrent.futures
+import functools
 import itertools
+import multiprocessing
+import operator
 import os
 import pathlib
 import re
-from typing import Dict, Iterable, List, Optional, Set, Tuple, Type, Union, cast
+import sys
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 import warnings
 
+# `graphviz.quoting` isn't re-exported by graphviz, but is stable within
+# the `graphviz ~= 0.20.0` pin in pyproject.toml
 from graphviz import Digraph, ExecutableNotFound
-from graphviz import version as graphviz_version
+from graphviz import pipe as graphviz_pipe, version as graphviz_version
+from graphviz.quoting import attr_list, quote, quote_edge
 from tqdm import tqdm
-from tqdm.contrib.concurrent import process_map
 
 import ford.utils
 
@@ -64,25 +83,54 @@ from ford.sourceform import (
     FortranType,
 )
 
-try:
-    graphviz_version()
-    graphviz_installed = True
-except ExecutableNotFound:
-    graphviz_installed = False
+
+@functools.lru_cache(maxsize=1)
+def _graphviz_installed() -> bool:
+    """Check whether Graphviz is available. This needs to run ``dot``,
+    so it is only done the first time it's asked for
+    """
+    try:
+        graphviz_version()
+        return True
+    except ExecutableNotFound:
+        return False
+
+
+def __getattr__(name: str):
+    # `graphviz_installed` is computed on first access, rather than at import
+    if name == "graphviz_installed":
+        return _graphviz_installed()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+# Neighbouring parts of these can't match the same characters, so
+# matching takes linear time, even on malformed input
 HYPERLINK_RE = re.compile(
-    r"^\s*<\s*a\s+.*href=(\"[^\"]+\"|'[^']+').*>(.*)</\s*a\s*>\s*$", re.IGNORECASE
+    r"^\s*<\s*a\s([^>]*)>(.*)</\s*a\s*>\s*$", re.ASCII | re.IGNORECASE
 )
+HREF_RE = re.compile(r"href=(\"[^\"]+\"|'[^']+')", re.ASCII | re.IGNORECASE)
 WIDTH_RE = re.compile('width="(.*?)pt"', re.IGNORECASE)
 HEIGHT_RE = re.compile('height="(.*?)pt"', re.IGNORECASE)
 EM_RE = re.compile("<em>(.*)</em>", re.IGNORECASE)
 
+# Sort key for nodes and entities, equivalent to their `__lt__` but
+# fetching each `ident` just once, rather than in every comparison
+_by_ident = operator.attrgetter("ident")
+
+
+def _hue_to_colour(hue: float) -> str:
+    r, g, b = colorsys.hsv_to_rgb(hue, 1.0, 1.0)
+    return f"#{int(255 * r)}{int(255 * g)}{int(255 * b)}"
+
+
+# Edge colours spread evenly around the colour wheel
+_RAINBOW_PALETTE = [_hue_to_colour(i / 256) for i in range(256)]
+
 
-def newdict(old, key, val):
-    new = copy.copy(old)
-    new[key] = val
-    return new
+def rainbowcolour(depth: int, maxd: int) -> str:
+    """Colour for edge number ``depth`` out of ``maxd``, taken from
+    a fixed palette"""
+    return _RAINBOW_PALETTE[depth * len(_RAINBOW_PALETTE) // maxd]
 
 
 def is_module(obj):
@@ -152,6 +200,13 @@ class GraphData:
         self.parent_dir = parent_dir
         self.coloured_edges = coloured_edges
         self.show_proc_parent = show_proc_parent
+        # Placeholder entities for things only known by name
+        self._external_entities: Dict[Tuple[type, str], FortranEntity] = {}
+
+    # Maps concrete entity types to the name of their collection and
+    # the corresponding node type, filled in by
+    # `_get_collection_and_node_type`
+    _node_types: Dict[type, Tuple[str, Type["BaseNode"]]] = {}
 
     def _get_collection_and_node_type(
         self, obj: FortranEntity
@@ -162,20 +217,37 @@ class GraphData:
 
         """
 
+        try:
+            collection, NodeType = self._node_types[type(obj)]
+        except KeyError:
+            collection, NodeType = self._find_collection_and_node_type(obj)
+            self._node_types[type(obj)] = (collection, NodeType)
+
+        return getattr(self, collection), NodeType
+
+    @staticmethod
+    def _find_collection_and_node_type(
+        obj: FortranEntity,
+    ) -> Tuple[str, Type["BaseNode"]]:
+        """Work out the name of the collection for ``obj``, and the
+        corresponding node type
+
+        """
+
         if is_submodule(obj):
-            return self.submodules, SubmodNode
+            return "submodules", SubmodNode
         if is_module(obj):
-            return self.modules, ModNode
+            return "modules", ModNode
         if is_type(obj):
-            return self.types, TypeNode
+            return "types", TypeNode
         if is_proc(obj):
-            return self.procedures, ProcNode
+            return "procedures", ProcNode
         if is_program(obj):
-            return self.programs, ProgNode
+            return "programs", ProgNode
         if is_sourcefile(obj):
-            return self.sourcefiles, FileNode
+            return "sourcefiles", FileNode
         if is_blockdata(obj):
-            return self.blockdata, BlockNode
+            return "blockdata", BlockNode
 
         raise BadType(
             f"Unrecognised object type '{type(obj).__name__}' for object '{obj}' when constructing graphs"
@@ -216,7 +288,8 @@ class GraphData:
             registering children during node creation
 
         """
-        hist = hist or {}
+        if hist is None:
+            hist = {}
 
         if obj in hist:
             return hist[obj]
@@ -227,10 +300,22 @@ class GraphData:
 
         return collection[obj]
 
+    def _get_external_entity(self, cls: type, name: str) -> FortranEntity:
+        """Return the placeholder entity of type ``cls`` for ``name``,
+        creating it if needed. Reusing the same entity means every
+        reference to ``name`` shares one node, instead of building an
+        identical node at each use
+        """
+        try:
+            return self._external_entities[cls, name]
+        except KeyError:
+            entity = self._external_entities[cls, name] = cls(name)
+            return entity
+
     def get_module_node(self, mod: Union[FortranModule, str]) -> ModNode:
         if isinstance(mod, str):
             # Most likely a third-party module
-            mod = ExternalModule(mod)
+            mod = self._get_external_entity(ExternalModule, mod)
         return cast(ModNode, self.get_node(mod))
 
     def get_procedure_node(
@@ -240,7 +325,7 @@ class GraphData:
     ) -> ProcNode:
         if isinstance(procedure, str):
             # Most likely a third-party procedure
-            procedure = ExternalSubroutine(procedure)
+            procedure = self._get_external_entity(ExternalSubroutine, procedure)
             procedure.proctype = "unknown"
 
         return cast(ProcNode, self.get_node(procedure, hist))
@@ -250,13 +335,13 @@ class GraphData:
     ) -> TypeNode:
         if isinstance(type_, str):
             # Most likely a third-party type
-            type_ = ExternalType(type_)
+            type_ = self._get_external_entity(ExternalType, type_)
 
         return cast(TypeNode, self.get_node(type_, hist))
 
 
 def get_call_nodes(
-    calls: List[Union[str, FortranEntity]],
+    calls: Iterable[Union[str, FortranEntity]],
     visited: Optional[Set[Union[str, FortranEntity]]] = None,
     result: Optional[Set[Union[str, FortranEntity]]] = None,
 ) -> Set[Union[str, FortranEntity]]:
@@ -294,7 +379,9 @@ def get_call_nodes(
             result.add(call)
         else:
             # If the call is not visible or a simple binding, recursively call the function on the children of the call.
-            calls = getattr(call, "calls", []) + getattr(call, "bindings", [])
+            calls = itertools.chain(
+                getattr(call, "calls", ()), getattr(call, "bindings", ())
+            )
             get_call_nodes(calls, visited, result)
 
     return result
@@ -313,6 +400,21 @@ class BaseNode:
 
     """
 
+    __slots__ = (
+        "attribs",
+        "fromstr",
+        "url",
+        "name",
+        "ident",
+        "afferent",
+        "efferent",
+        "dot_id",
+        "edge_id",
+        "_hash",
+        "_sorted_cache",
+        "_dot_statement",
+    )
+
     colour = "#777777"
 
     def __init__(
@@ -321,6 +423,8 @@ class BaseNode:
         graph_data: GraphData,
         hist: Optional[NodeCollection] = None,
     ):
+        # Graphviz attributes for this node. These are passed straight
+        # to graphviz, so values must all be strings
         self.attribs = {"color": self.colour, "fontcolor": "white", "style": "filled"}
         if isinstance(
             obj,
@@ -343,9 +447,16 @@ class BaseNode:
         self.url = None
         if isinstance(obj, str):
             self.fromstr = True
-            if m := HYPERLINK_RE.match(obj):
-                self.url = m.group(1)[1:-1]
-                self.name = m.group(2)
+            # Cheap check before the regex: most names aren't hyperlinks
+            if (
+                "<" in obj
+                and (m := HYPERLINK_RE.match(obj))
+                and (href := HREF_RE.search(m.group(1)))
+            ):
+                self.url = href.group(1)[1:-1]
+                # Any markup inside the link is dropped, keeping the
+                # text after it
+                self.name = m.group(2).rsplit(">", 1)[-1]
             else:
                 self.name = obj
             self.ident = self.name
@@ -354,10 +465,18 @@ class BaseNode:
             d = obj.get_dir() or "none"
             self.ident = f"{d}~{obj.ident}"
             self.name = obj.name
-            if m := EM_RE.search(self.name):
+            if "<" in self.name and (m := EM_RE.search(self.name)):
                 self.name = f"<<i>{m.group(1).strip()}</i>>"
             self.url = obj.get_url()
 
+        # The same idents are used as keys across many graphs, so
+        # intern them and hash them once up front
+        self.ident = sys.intern(self.ident)
+        self._hash = hash(self.ident)
+        self.dot_id = quote(self.ident)
+        # Edge endpoints are quoted as in `Digraph.edge`, which reads
+        # any ``:`` as separating a node from its port
+        self.edge_id = quote_edge(self.ident)
         self.attribs["label"] = self.name
         if self.url and getattr(obj, "visible", True):
             if self.fromstr or hasattr(obj, "external_url"):
@@ -366,6 +485,42 @@ class BaseNode:
                 self.attribs["URL"] = graph_data.parent_dir + self.url
         self.afferent = 0
         self.efferent = 0
+        self._sorted_cache: Dict[str, Tuple[BaseNode, ...]] = {}
+        self._dot_statement: Optional[str] = None
+
+    def dot_statement(self) -> str:
+        """Return the DOT statement declaring this node with all of
+        its attributes.
+
+        This is built the first time it's needed, after the subclass
+        has finished setting up the attributes, and then reused by
+        every graph containing this node
+        """
+        if self._dot_statement is None:
+            attribs = dict(self.attribs)
+            label = attribs.pop("label", None)
+            attributes = attr_list(label, kwargs=attribs)
+            self._dot_statement = f"\t{self.dot_id}{attributes}\n"
+        return self._dot_statement
+
+    def sorted_view(self, attr: str) -> Tuple[BaseNode, ...]:
+        """Return the nodes in the collection ``attr`` (for example,
+        ``uses`` or ``calls``) in sorted order, or an empty tuple if
+        this node doesn't have that collection.
+
+        The sorted nodes are cached, as the same node is often visited
+        by many graphs. Collections of nodes only ever grow, so the
+        cache is refreshed if the size of the collection changes.
+        """
+        collection = getattr(self, attr, ())
+        if not collection:
+            # Most collections are empty, so don't bother caching them
+            return ()
+        cached = self._sorted_cache.get(attr)
+        if cached is None or len(cached) != len(collection):
+            cached = tuple(sorted(collection, key=_by_ident))
+            self._sorted_cache[attr] = cached
+        return cached
 
     def __eq__(self, other):
         return self.ident == other.ident
@@ -377,12 +532,14 @@ class BaseNode:
         # When making graphs in parallel, nodes might not have all
         # their attributes at some point?
         try:
-            return hash(self.ident)
+            return self._hash
         except AttributeError:
             return id(self)
 
 
 class ModNode(BaseNode):
+    __slots__ = ("uses", "used_by", "children")
+
     colour = "#337AB7"
 
     def __init__(self, obj, gd, hist=None):
@@ -401,6 +558,8 @@ class ModNode(BaseNode):
 
 
 class SubmodNode(ModNode):
+    __slots__ = ("ancestor",)
+
     colour = "#5bc0de"
 
     def __init__(self, obj, gd, hist=None):
@@ -418,6 +577,8 @@ class SubmodNode(ModNode):
 
 
 class TypeNode(BaseNode):
+    __slots__ = ("ancestor", "children", "comp_types", "comp_of", "visible")
+
     colour = "#5cb85c"
 
     def __init__(self, obj, gd, hist=None):
@@ -429,39 +590,51 @@ class TypeNode(BaseNode):
         if self.fromstr:
             return
 
-        hist = newdict(hist or {}, obj, self)
-
         if hasattr(obj, "external_url"):
             # Stop following chain, as this object is in an external project
             return
 
-        if obj.extends:
-            self.ancestor = gd.get_type_node(obj.extends, hist)
-            self.ancestor.children.add(self)
-            self.ancestor.visible = getattr(obj.extends, "visible", True)
+        hist = {} if hist is None else hist
+        hist[obj] = self
+        try:
+            if obj.extends:
+                self.ancestor = gd.get_type_node(obj.extends, hist)
+                self.ancestor.children.add(self)
+                self.ancestor.visible = getattr(obj.extends, "visible", True)
+
+            # Names of the components of each type, joined into labels
+            # once all the components have been found
+            components: Dict[TypeNode, List[str]] = {}
+
+            for var in obj.local_variables:
+                if var.vartype not in ["type", "class"]:
+                    continue
 
-        for var in obj.local_variables:
-            if var.vartype not in ["type", "class"]:
-                continue
+                proto = var.proto[0]
+                if proto == "*":
+                    continue
 
-            proto = var.proto[0]
-            if proto == "*":
-                continue
+                node = gd.get_type_node(proto, hist)
 
-            node = gd.get_type_node(proto, hist)
+                node.visible = getattr(proto, "visible", True)
+                components.setdefault(node, []).append(var.name)
 
-            node.visible = getattr(proto, "visible", True)
-            if self in node.comp_of:
-                node.comp_of[self] += ", " + var.name
-            else:
-                node.comp_of[self] = var.name
-            if node in self.comp_types:
-                self.comp_types[node] += ", " + var.name
-            else:
-                self.comp_types[node] = var.name
+            for node, names in components.items():
+                self.comp_types[node] = node.comp_of[self] = ", ".join(names)
+        finally:
+            del hist[obj]
 
 
 class ProcNode(BaseNode):
+    __slots__ = (
+        "proctype",
+        "uses",
+        "calls",
+        "called_by",
+        "interfaces",
+        "interfaced_by",
+    )
+
     COLOURS = {
         "subroutine": "#d9534f",
         "function": "#d94e8f",
@@ -505,40 +678,45 @@ class ProcNode(BaseNode):
         if self.fromstr:
             return
 
-        hist = newdict(hist or {}, obj, self)
-
-        for u in getattr(obj, "uses", []):
-            n = gd.get_module_node(u)
-            n.used_by.add(self)
-            self.uses.add(n)
-
-        for call in get_call_nodes(
-            getattr(obj, "calls", []) + getattr(obj, "bindings", [])
-        ):
-            n = gd.get_procedure_node(call, hist)
-            n.called_by.add(self)
-            self.calls.add(n)
-
-        if self.proctype != "interface":
-            return
-
-        for m in getattr(obj, "modprocs", []):
-            if m.procedure and getattr(m.procedure, "visible", True):
-                n = gd.get_procedure_node(m.procedure, hist)
+        hist = {} if hist is None else hist
+        hist[obj] = self
+        try:
+            for u in getattr(obj, "uses", ()):
+                n = gd.get_module_node(u)
+                n.used_by.add(self)
+                self.uses.add(n)
+
+            for call in get_call_nodes(
+                itertools.chain(getattr(obj, "calls", ()), getattr(obj, "bindings", ()))
+            ):
+                n = gd.get_procedure_node(call, hist)
+                n.called_by.add(self)
+                self.calls.add(n)
+
+            if self.proctype != "interface":
+                return
+
+            for m in getattr(obj, "modprocs", ()):
+                if m.procedure and getattr(m.procedure, "visible", True):
+                    n = gd.get_procedure_node(m.procedure, hist)
+                    n.interfaced_by.add(self)
+                    self.interfaces.add(n)
+
+            if (
+                isinstance(obj, FortranModuleProcedureInterface)
+                and isinstance(obj.procedure.module, (str, FortranProcedure))
+                and getattr(obj.procedure.module, "visible", True)
+            ):
+                n = gd.get_procedure_node(obj.procedure.module, hist)
                 n.interfaced_by.add(self)
                 self.interfaces.add(n)
-
-        if (
-            isinstance(obj, FortranModuleProcedureInterface)
-            and isinstance(obj.procedure.module, (str, FortranProcedure))
-            and getattr(obj.procedure.module, "visible", True)
-        ):
-            n = gd.get_procedure_node(obj.procedure.module, hist)
-            n.interfaced_by.add(self)
-            self.interfaces.add(n)
+        finally:
+            del hist[obj]
 
 
 class ProgNode(BaseNode):
+    __slots__ = ("uses", "calls")
+
     colour = "#f0ad4e"
 
     def __init__(self, obj, gd, hist=None):
@@ -559,6 +737,8 @@ class ProgNode(BaseNode):
 
 
 class BlockNode(BaseNode):
+    __slots__ = ("uses",)
+
     colour = "#5cb85c"
 
     def __init__(self, obj, gd, hist=None):
@@ -573,6 +753,8 @@ class BlockNode(BaseNode):
 
 
 class FileNode(BaseNode):
+    __slots__ = ()
+
     colour = "#f0ad4e"
 
     def __init__(self, obj, gd, hist=None):
@@ -583,118 +765,82 @@ class FileNode(BaseNode):
         if self.fromstr:
             return
 
-        hist = newdict(hist or {}, obj, self)
-
-        for mod in itertools.chain(
-            obj.modules,
-            obj.submodules,
-            obj.functions,
-            obj.subroutines,
-            obj.programs,
-            obj.blockdata,
-        ):
-            for dep in mod.deplist:
-                if dep.source_file == obj:
-                    continue
-                n = hist.get(dep.source_file, gd.get_node(dep.source_file, hist))
-                n.afferent.add(self)
-                self.efferent.add(n)
-
-
-def _edge(
-    tail: BaseNode, head: BaseNode, style: str, colour: str, label: Optional[str] = None
-) -> Dict:
-    return {
-        "tail_node": tail,
-        "head_node": head,
-        "edge": {
-            "tail_name": tail.ident,
-            "head_name": head.ident,
-            "style": style,
-            "color": colour,
-            "label": label,
+        hist = {} if hist is None else hist
+        hist[obj] = self
+        try:
+            for mod in itertools.chain(
+                obj.modules,
+                obj.submodules,
+                obj.functions,
+                obj.subroutines,
+                obj.programs,
+                obj.blockdata,
+            ):
+                for dep in mod.deplist:
+                    if dep.source_file == obj:
+                        continue
+                    n = gd.get_node(dep.source_file, hist)
+                    n.afferent.add(self)
+                    self.efferent.add(n)
+        finally:
+            del hist[obj]
+
+
+class Edge(NamedTuple):
+    """An edge between two nodes in a graph"""
+
+    tail: BaseNode
+    head: BaseNode
+    style: str
+    colour: str
+    label: Optional[str] = None
+
+
+@functools.lru_cache(maxsize=None)
+def _edge_attributes(style: str, colour: str, label: Optional[str]) -> str:
+    """Return the DOT attribute list for an edge. There are only two
+    styles and a fixed palette of colours, so most edges share one"""
+    return attr_list(label, kwargs={"color": colour, "style": style})
+
+
+def _dot_edge_statement(edge: Edge) -> str:
+    """Return the DOT statement for ``edge``"""
+    attributes = _edge_attributes(edge.style, edge.colour, edge.label)
+    return f"\t{edge.tail.edge_id} -> {edge.head.edge_id}{attributes}\n"
+
+
+def _make_legend(entities: Iterable[BaseNode]) -> str:
+    """Make a legend containing a collection of entities"""
+    dot = Digraph(
+        "Graph Key",
+        graph_attr={"size": "8.90625,1000.0", "concentrate": "false"},
+        node_attr={
+            "shape": "box",
+            "height": "0.0",
+            "margin": "0.08",
+            "fontname": "Helvetica",
+            "fontsize": "10.5",
         },
-    }
-
-
-def _solid_edge(
-    tail: BaseNode, head: BaseNode, colour: str, label: Optional[str] = None
-) -> Dict:
-    return _edge(tail, head, "solid", colour, label)
-
-
-def _dashed_edge(
-    tail: BaseNode, head: BaseNode, colour: str, label: Optional[str] = None
-) -> Dict:
-    return _edge(tail, head, "dashed", colour, label)
-
-
-if graphviz_installed:
-    # Create the legends for the graphs. These are their own separate graphs,
-    # without edges
-    gd = GraphData("", False, False)
-
-    # Graph nodes for a bunch of fake entities that we'll use in the legend
-    _module = gd.get_node(ExternalModule("Module"))
-    _submodule = gd.get_node(ExternalSubmodule("Submodule"))
-    _type = gd.get_node(ExternalType("Type"))
-    _subroutine = gd.get_node(ExternalSubroutine("Subroutine"))
-    _function = gd.get_node(ExternalFunction("Function"))
-    _interface = gd.get_node(ExternalInterface("Interface"))
-    _boundproc = gd.get_node(ExternalBoundProcedure("Type Bound Procedure"))
-    _unknown_proc = ExternalSubroutine("Unknown Procedure Type")
-    _unknown_proc.proctype = "Unknown"
-    _unknown = gd.get_node(_unknown_proc)
-    _program = gd.get_node(ExternalProgram("Program"))
-    _sourcefile = gd.get_node(ExternalSourceFile("Source File"))
-
-    def _make_legend(entities):
-        """Make a legend containing a collection of entities"""
-        dot = Digraph(
-            "Graph Key",
-            graph_attr={"size": "8.90625,1000.0", "concentrate": "false"},
-            node_attr={
-                "shape": "box",
-                "height": "0.0",
-                "margin": "0.08",
-                "fontname": "Helvetica",
-                "fontsize": "10.5",
-            },
-            edge_attr={"fontname": "Helvetica", "fontsize": "9.5"},
-            format="svg",
-            engine="dot",
-        )
-        for entity in entities:
-            dot.node(entity.name, **entity.attribs)
-        dot.node("This Page's Entity")
-        return dot.pipe().decode("utf-8")
-
-    mod_svg = _make_legend([_module, _submodule, _subroutine, _function, _program])
-    type_svg = _make_legend([_type])
-    call_svg = _make_legend(
-        [_subroutine, _function, _interface, _boundproc, _unknown, _program]
+        edge_attr={"fontname": "Helvetica", "fontsize": "9.5"},
+        format="svg",
+        engine="dot",
     )
-    file_svg = _make_legend([_sourcefile])
-else:
-    mod_svg = ""
-    type_svg = ""
-    call_svg = ""
-    file_svg = ""
+    for entity in entities:
+        dot.node(entity.name, **entity.attribs)
+    dot.node("This Page's Entity")
+    return dot.pipe().decode("utf-8")
+
 
 NODE_DIAGRAM = "<p>Nodes of different colours represent the following: </p>"
 
-MOD_GRAPH_KEY = f"""
-{NODE_DIAGRAM}
-{mod_svg}
+MOD_GRAPH_TEXT = """
 <p>Solid arrows point from a submodule to the (sub)module which it is
 descended from. Dashed arrows point from a module or program unit to 
 modules which it uses.
 </p>
 """  # noqa W291
 
-TYPE_GRAPH_KEY = f"""
-{NODE_DIAGRAM}
-{type_svg}
+TYPE_GRAPH_TEXT = """
 <p>Solid arrows point from a derived type to the parent type which it
 extends. Dashed arrows point from a derived type to the other
 types it contains as a components, with a label listing the name(s) of
@@ -702,9 +848,7 @@ said component(s).
 </p>
 """
 
-CALL_GRAPH_KEY = f"""
-{NODE_DIAGRAM}
-{call_svg}
+CALL_GRAPH_TEXT = """
 <p>Solid arrows point from a procedure to one which it calls. Dashed 
 arrows point from an interface to procedures which implement that interface.
 This could include the module procedures in a generic interface or the
@@ -712,24 +856,62 @@ implementation in a submodule of an interface in a parent module.
 </p>
 """  # noqa W291
 
-FILE_GRAPH_KEY = f"""
-{NODE_DIAGRAM}
-{file_svg}
+FILE_GRAPH_TEXT = """
 <p>Solid arrows point from a file to a file which it depends on. A file
 is dependent upon another if the latter must be compiled before the former
 can be.
 </p>
 """
 
+
+@functools.lru_cache(maxsize=1)
+def _graph_keys() -> Dict[str, str]:
+    """Create the legends for each kind of graph. Each legend is its
+    own separate graph, without edges, so this is only done the first
+    time they are needed
+    """
+    svgs = {"module": "", "type": "", "call": "", "file": ""}
+
+    if _graphviz_installed():
+        gd = GraphData("", False, False)
+
+        # Graph nodes for a bunch of fake entities that we'll use in the legend
+        module = gd.get_node(ExternalModule("Module"))
+        submodule = gd.get_node(ExternalSubmodule("Submodule"))
+        type_ = gd.get_node(ExternalType("Type"))
+        subroutine = gd.get_node(ExternalSubroutine("Subroutine"))
+        function = gd.get_node(ExternalFunction("Function"))
+        interface = gd.get_node(ExternalInterface("Interface"))
+        boundproc = gd.get_node(ExternalBoundProcedure("Type Bound Procedure"))
+        unknown_proc = ExternalSubroutine("Unknown Procedure Type")
+        unknown_proc.proctype = "Unknown"
+        unknown = gd.get_node(unknown_proc)
+        program = gd.get_node(ExternalProgram("Program"))
+        sourcefile = gd.get_node(ExternalSourceFile("Source File"))
+
+        legends = [
+            [module, submodule, subroutine, function, program],
+            [type_],
+            [subroutine, function, interface, boundproc, unknown, program],
+            [sourcefile],
+        ]
+        # Each legend is a separate call to dot, so run them side by side
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            svgs = dict(zip(svgs, pool.map(_make_legend, legends)))
+
+    texts = {
+        "module": MOD_GRAPH_TEXT,
+        "type": TYPE_GRAPH_TEXT,
+        "call": CALL_GRAPH_TEXT,
+        "file": FILE_GRAPH_TEXT,
+    }
+    return {kind: f"\n{NODE_DIAGRAM}\n{svgs[kind]}{texts[kind]}" for kind in svgs}
+
+
 COLOURED_NOTICE = """Where possible, edges connecting nodes are
 given different colours to make them easier to distinguish in
 large graphs."""
 
-del call_svg
-del file_svg
-del type_svg
-del mod_svg
-
 
 class FortranGraph:
     """Graph of some relationship for a given entity
@@ -767,7 +949,28 @@ class FortranGraph:
         Nesting level where the graph was truncated
     """
 
+    __slots__ = (
+        "root",
+        "data",
+        "hop_nodes",
+        "hop_edges",
+        "added",
+        "_added_ids",
+        "max_nesting",
+        "max_nodes",
+        "warn",
+        "truncated",
+        "ident",
+        "imgfile",
+        "dot",
+        "svg_src",
+        "scaled",
+        "_html",
+    )
+
     RANKDIR = "RL"
+    # Graph attributes overriding the defaults for this kind of graph
+    GRAPH_ATTRIBUTES: Dict[str, str] = {}
     _should_add_nested_nodes = False
     _legend = ""
 
@@ -779,9 +982,12 @@ class FortranGraph:
     ):
         self.root = []
         self.data = data
-        self.hop_nodes: List[BaseNode] = []
-        self.hop_edges: List[BaseNode] = []
+        self.hop_nodes: Dict[BaseNode, None] = {}
+        self.hop_edges: List[Edge] = []
         self.added: Set[BaseNode] = set()
+        # Identities of the nodes in `added`, which are cheaper to
+        # look up than the nodes themselves
+        self._added_ids: Set[int] = set()
         self.max_nesting = 0
         self.max_nodes = 1
         self.warn = False
@@ -789,15 +995,20 @@ class FortranGraph:
 
         if not isinstance(root, Iterable):
             root = [root]
-        root = sorted(list(root))
+        else:
+            # Iterated more than once below
+            root = list(root)
 
+        # Only the nodes need sorting, which is done below
         for r in root:
             self.root.append(self.data.get_node(r))
             self.max_nesting = max(self.max_nesting, int(r.meta["graph_maxdepth"]))
             self.max_nodes = max(self.max_nodes, int(r.meta["graph_maxnodes"]))
             self.warn = self.warn or (r.settings["warn"])
 
-        ident = ident or f"{root[0].get_dir()}~~{root[0].ident}"
+        if ident is None:
+            first = min(root, key=_by_ident)
+            ident = f"{first.get_dir()}~~{first.ident}"
         self.ident = f"{ident}~~{self.__class__.__name__}"
         self.imgfile = self.ident
         self.dot = Digraph(
@@ -807,6 +1018,7 @@ class FortranGraph:
                 "rankdir": self.RANKDIR,
                 "concentrate": "true",
                 "id": self.ident,
+                **self.GRAPH_ATTRIBUTES,
             },
             node_attr={
                 "shape": "box",
@@ -820,31 +1032,48 @@ class FortranGraph:
             engine="dot",
         )
         # add root nodes to the graph
-        for n in sorted(self.root):
+        self.root.sort(key=_by_ident)
+        for n in self.root:
             if len(self.root) == 1:
                 self.dot.node(n.ident, label=n.attribs["label"])
             else:
                 self.dot.node(n.ident, **n.attribs)
             self.added.add(n)
+            self._added_ids.add(id(n))
         # add nodes and edges depending on the root nodes to the graph
         self.add_nodes(self.root)
 
-        if graphviz_installed:
-            self.svg_src = self.dot.pipe().decode("utf-8")
-            self.svg_src = self.svg_src.replace(
-                "<svg ", '<svg id="' + re.sub(r"[^\w]", "", self.ident) + '" '
-            )
-            if match := WIDTH_RE.search(self.svg_src):
-                width = int(match.group(1))
-            else:
-                width = 0
-            if isinstance(self, (ModuleGraph, CallGraph, TypeGraph)):
-                self.scaled = width >= 855
-            else:
-                self.scaled = width >= 641
-        else:
+        # SVG is generated later by `render`
+        self.svg_src: Optional[str] = None
+        self.scaled = False
+        self._html: Optional[str] = None
+
+    def render(self) -> Tuple[str, int]:
+        """Generate the SVG for this graph using Graphviz, returning
+        the SVG source and its width.
+
+        This is done separately from constructing the graph so that
+        many graphs can be rendered at once with `render_graphs`
+        """
+        if not _graphviz_installed():
             self.svg_src = ""
             self.scaled = False
+            return self.svg_src, 0
+
+        svg_src = self.dot.pipe().decode("utf-8")
+        svg_src = svg_src.replace(
+            "<svg ", '<svg id="' + re.sub(r"[^\w]", "", self.ident) + '" '
+        )
+        if match := WIDTH_RE.search(svg_src):
+            width = int(match.group(1))
+        else:
+            width = 0
+        if isinstance(self, (ModuleGraph, CallGraph, TypeGraph)):
+            self.scaled = width >= 855
+        else:
+            self.scaled = width >= 641
+        self.svg_src = svg_src
+        return svg_src, width
 
     def add_to_graph(self, nodes, edges, nesting):
         """
@@ -863,12 +1092,25 @@ class FortranGraph:
             self.truncated = nesting
             return False
 
-        for n in sorted(nodes):
-            strattribs = {key: str(a) for key, a in n.attribs.items()}
-            self.dot.node(n.ident, **strattribs)
-        for edge in edges:
-            self.dot.edge(**edge["edge"])
+        # Write the DOT statements straight into the graph body, rather
+        # than formatting them afresh in `Digraph.node`/`Digraph.edge`
+        body = self.dot.body
+        body.extend(n.dot_statement() for n in nodes)
+        body.extend(_dot_edge_statement(edge) for edge in edges)
         self.added.update(nodes)
+        self._added_ids.update(map(id, nodes))
+        return True
+
+    def _needs_svg(self) -> bool:
+        """True if the HTML representation of this graph includes its
+        rendered SVG, following the same rules as `_make_html`"""
+        if len(self.hop_nodes) > 0 and len(self.root) == 1:
+            # Shown as a table instead
+            return False
+        if len(self.added) <= 1:
+            return False
+        if self.warn and not len(self.root) <= len(self.added) <= self.max_nodes:
+            return False
         return True
 
     def __str__(self):
@@ -879,7 +1121,12 @@ class FortranGraph:
         with many dependencies it will be shown as a table instead to ease
         the rendering in browsers.
         """
+        # The graph doesn't change once built, so neither does its HTML
+        if self._html is None:
+            self._html = self._make_html()
+        return self._html
 
+    def _make_html(self) -> str:
         graph_as_table = len(self.hop_nodes) > 0 and len(self.root) == 1
 
         # Do not render empty graphs
@@ -908,6 +1155,8 @@ class FortranGraph:
             rettext = self._make_graph_as_table()
         # generate svg graph
         else:
+            if self.svg_src is None:
+                self.render()
             rettext = f'<div class="depgraph">{self.svg_src}</div>'
             # add zoom ability for big graphs
             if self.scaled:
@@ -919,9 +1168,17 @@ class FortranGraph:
                   );
                 </script>"""
 
-        graph_help_name = f"{self.__class__.__name__}-help-text"
+        return rettext + self._legend_html(self.data.coloured_edges)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _legend_html(cls, coloured_edges: bool) -> str:
+        """The help text for this kind of graph, which is the same for
+        every graph of the same class"""
 
-        legend_graph = f"""\
+        graph_help_name = f"{cls.__name__}-help-text"
+
+        return f"""\
         <div><a type="button" class="graph-help" data-toggle="modal" href="#{graph_help_name}">Help</a></div>
           <div class="modal fade" id="{graph_help_name}" tabindex="-1" role="dialog">
             <div class="modal-dialog modal-lg" role="document">
@@ -932,11 +1189,10 @@ class FortranGraph:
                   </button>
                   <h4 class="modal-title" id="-graph-help-label">Graph Key</h4>
                 </div>
-              <div class="modal-body">{self._legend} {COLOURED_NOTICE if self.data.coloured_edges else ""}</div>
+              <div class="modal-body">{_graph_keys().get(cls._legend, "")} {COLOURED_NOTICE if coloured_edges else ""}</div>
             </div>
           </div>
         </div>"""
-        return rettext + legend_graph
 
     def _make_graph_as_table(self):
         # generate a table graph if maximum number of nodes gets exceeded in
@@ -949,18 +1205,18 @@ class FortranGraph:
 
         # Work out if the root node is the head or tail of the
         # arrow, and which direction the arrows point in
-        if self.hop_edges[0]["edge"]["tail_name"] == self.root[0].ident:
-            key = "head_node"
+        if self.hop_edges[0].tail.ident == self.root[0].ident:
+            key = "head"
             root_on_left = self.RANKDIR == "LR"
             arrowtemp = arrow_right if root_on_left else arrow_left
         else:
-            key = "tail_node"
+            key = "tail"
             root_on_left = self.RANKDIR == "RL"
             arrowtemp = arrow_left if root_on_left else arrow_right
 
         # Sort nodes in alphabetical order by either the head or
         # tail node's label
-        self.hop_edges.sort(key=lambda x: x[key].attribs["label"].lower())
+        self.hop_edges.sort(key=lambda x: getattr(x, key).attribs["label"].lower())
 
         # Now construct each node and associated edge as a single row in a table.
         # The root node takes up one column and spans all rows
@@ -968,14 +1224,14 @@ class FortranGraph:
         root = f'<td class="root" rowspan="{total_rows}">{self.root[0].attribs["label"]}</td>'
         rows = ""
         for edge in self.hop_edges:
-            style = edge["edge"]["style"]
+            style = edge.style
             # The 'w' here is in white and is used to correctly position the arrow
             # shaft in the centre of the arrowhead
-            label = edge["edge"]["label"] or "w"
+            label = edge.label or "w"
             text_loc = "Bottom" if label == "w" else "Text"
             arrow_args = {"style": style, "label": label, "text_loc": text_loc}
             arrow = arrowtemp.format(**arrow_args)
-            attribs = edge[key].attribs
+            attribs = getattr(edge, key).attribs
             try:
                 link = f'<a href="{attribs["URL"]}">{attribs["label"]}</a></td>'
             except KeyError:
@@ -999,57 +1255,55 @@ class FortranGraph:
         return bool(self.__str__())
 
     def create_svg(self, out_location: pathlib.Path):
-        if len(self.added) > len(self.root):
+        if self._has_image_file():
             out_location = pathlib.Path(out_location)
-            self._create_image_file(out_location / self.imgfile)
-
-    def _create_image_file(self, filename: pathlib.Path):
-        if not graphviz_installed:
-            return
+            _create_image_files([(self.dot, out_location / self.imgfile)])
 
-        self.dot.render(str(filename), cleanup=False)
-        filename.rename(str(filename) + ".gv")
+    def _has_image_file(self) -> bool:
+        """True if `create_svg` saves this graph to a file"""
+        return len(self.added) > len(self.root)
 
     def add_nodes(self, nodes, nesting=1):
-        """Add nodes and edges to this graph, based on the collection ``nodes``
+        """Add nodes and edges to this graph, based on the collection
+        ``nodes``. If `_should_add_nested_nodes` is set, the nodes
+        found in each hop are then added in turn, up to `max_nesting`
+        hops
 
-        Subclasses should implement `_add_node`, and optionally
-        `_extra_attributes`
+        Subclasses should implement `_add_node`, and optionally set
+        `GRAPH_ATTRIBUTES`
 
         """
-        hop_nodes = set()  # nodes in this hop
-        hop_edges = []  # edges in this hop
 
-        total_len = len(nodes)
+        # Hops still to be added, along with their nesting level
+        hops = collections.deque([(nodes, nesting)])
+        # Looked up once here, rather than for every node in every hop
+        add_node = self._add_node
+        coloured_edges = self.data.coloured_edges
 
-        def rainbowcolour(depth, maxd):
-            if not self.data.coloured_edges:
-                return "#000000"
-            (r, g, b) = colorsys.hsv_to_rgb(float(depth) / maxd, 1.0, 1.0)
-            return f"#{int(255 * r)}{int(255 * g)}{int(255 * b)}"
+        while hops:
+            nodes, nesting = hops.popleft()
 
-        for i, node in enumerate(sorted(nodes)):
-            colour = rainbowcolour(i, total_len)
+            # Nodes in this hop. This is used as an ordered set, so that
+            # the output is deterministic without sorting every hop
+            hop_nodes: Dict[BaseNode, None] = {}
+            hop_edges: List[Edge] = []  # edges in this hop
 
-            self._add_node(hop_nodes, hop_edges, node, colour)
+            total_len = len(nodes)
 
-        if not self.add_to_graph(hop_nodes, hop_edges, nesting):
-            return
+            for i, node in enumerate(nodes):
+                colour = rainbowcolour(i, total_len) if coloured_edges else "#000000"
+                add_node(hop_nodes, hop_edges, node, colour)
 
-        self._extra_attributes()
+            if not self.add_to_graph(hop_nodes, hop_edges, nesting):
+                return
 
-        if self._should_add_nested_nodes:
-            self._add_nested_nodes(hop_nodes, nesting)
+            if not self._should_add_nested_nodes or len(hop_nodes) == 0:
+                return
 
-    def _add_nested_nodes(self, hop_nodes, nesting):
-        """Handles nested nodes"""
-        if len(hop_nodes) == 0:
-            return
-
-        if nesting < self.max_nesting:
-            self.add_nodes(hop_nodes, nesting=nesting + 1)
-        else:
-            self.truncated = nesting
+            if nesting < self.max_nesting:
+                hops.append((hop_nodes, nesting + 1))
+            else:
+                self.truncated = nesting
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
         """Add a single node and its edges to this graph, typically by
@@ -1059,158 +1313,165 @@ class FortranGraph:
 
         raise NotImplementedError
 
-    def _extra_attributes(self):
-        """Add any extra attributes to the graph"""
-        pass
-
 
 class ModuleGraph(FortranGraph):
     """Shows the relationship between modules and submodules"""
 
-    _legend = MOD_GRAPH_KEY
+    __slots__ = ()
+
+    _legend = "module"
+    GRAPH_ATTRIBUTES = {"size": "11.875,1000.0"}
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for nu in sorted(node.uses):
-            if nu not in self.added:
-                hop_nodes.add(nu)
-            hop_edges.append(_dashed_edge(node, nu, colour))
+        for nu in node.sorted_view("uses"):
+            if id(nu) not in self._added_ids:
+                hop_nodes[nu] = None
+            hop_edges.append(Edge(node, nu, "dashed", colour))
 
         if hasattr(node, "ancestor"):
-            if node.ancestor not in self.added:
-                hop_nodes.add(node.ancestor)
-            hop_edges.append(_solid_edge(node, node.ancestor, colour))
-
-    def _extra_attributes(self):
-        self.dot.attr("graph", size="11.875,1000.0")
+            if id(node.ancestor) not in self._added_ids:
+                hop_nodes[node.ancestor] = None
+            hop_edges.append(Edge(node, node.ancestor, "solid", colour))
 
 
 class UsesGraph(FortranGraph):
     """Graphs how modules use other modules, including ancestor (sub)modules"""
 
+    __slots__ = ()
+
     _should_add_nested_nodes = True
-    _legend = MOD_GRAPH_KEY
+    _legend = "module"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for nu in sorted(node.uses):
-            if nu not in self.added:
-                hop_nodes.add(nu)
-            hop_edges.append(_dashed_edge(node, nu, colour))
+        for nu in node.sorted_view("uses"):
+            if id(nu) not in self._added_ids:
+                hop_nodes[nu] = None
+            hop_edges.append(Edge(node, nu, "dashed", colour))
 
         if hasattr(node, "ancestor"):
-            if node.ancestor not in self.added:
-                hop_nodes.add(node.ancestor)
-            hop_edges.append(_solid_edge(node, node.ancestor, colour))
+            if id(node.ancestor) not in self._added_ids:
+                hop_nodes[node.ancestor] = None
+            hop_edges.append(Edge(node, node.ancestor, "solid", colour))
 
 
 class UsedByGraph(FortranGraph):
     """Graphs how modules are used by other modules"""
 
+    __slots__ = ()
+
     _should_add_nested_nodes = True
-    _legend = MOD_GRAPH_KEY
+    _legend = "module"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for nu in sorted(getattr(node, "used_by", [])):
-            if nu not in self.added:
-                hop_nodes.add(nu)
-            hop_edges.append(_dashed_edge(nu, node, colour))
-        for c in sorted(getattr(node, "children", [])):
-            if c not in self.added:
-                hop_nodes.add(c)
-            hop_edges.append(_solid_edge(c, node, colour))
+        for nu in node.sorted_view("used_by"):
+            if id(nu) not in self._added_ids:
+                hop_nodes[nu] = None
+            hop_edges.append(Edge(nu, node, "dashed", colour))
+        for c in node.sorted_view("children"):
+            if id(c) not in self._added_ids:
+                hop_nodes[c] = None
+            hop_edges.append(Edge(c, node, "solid", colour))
 
 
 class FileGraph(FortranGraph):
     """Graphs relationships between source files"""
 
-    _legend = FILE_GRAPH_KEY
+    __slots__ = ()
+
+    _legend = "file"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for ne in sorted(node.efferent):
-            if ne not in self.added:
-                hop_nodes.add(ne)
-            hop_edges.append(_solid_edge(ne, node, colour))
+        for ne in node.sorted_view("efferent"):
+            if id(ne) not in self._added_ids:
+                hop_nodes[ne] = None
+            hop_edges.append(Edge(ne, node, "solid", colour))
 
 
 class EfferentGraph(FortranGraph):
     """Shows the relationship between the files which this one depends on"""
 
+    __slots__ = ()
+
     _should_add_nested_nodes = True
-    _legend = FILE_GRAPH_KEY
+    _legend = "file"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for ne in sorted(node.efferent):
-            if ne not in self.added:
-                hop_nodes.add(ne)
-            hop_edges.append(_dashed_edge(node, ne, colour))
+        for ne in node.sorted_view("efferent"):
+            if id(ne) not in self._added_ids:
+                hop_nodes[ne] = None
+            hop_edges.append(Edge(node, ne, "dashed", colour))
 
 
 class AfferentGraph(FortranGraph):
     """Shows the relationship between files which depend upon this one"""
 
+    __slots__ = ()
+
     _should_add_nested_nodes = True
-    _legend = FILE_GRAPH_KEY
+    _legend = "file"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for na in sorted(node.afferent):
-            if na not in self.added:
-                hop_nodes.add(na)
-            hop_edges.append(_dashed_edge(na, node, colour))
+        for na in node.sorted_view("afferent"):
+            if id(na) not in self._added_ids:
+                hop_nodes[na] = None
+            hop_edges.append(Edge(na, node, "dashed", colour))
 
 
 class TypeGraph(FortranGraph):
     """Graphs inheritance and composition relationships between derived types"""
 
-    _legend = TYPE_GRAPH_KEY
+    __slots__ = ()
+
+    _legend = "type"
+    GRAPH_ATTRIBUTES = {"size": "11.875,1000.0"}
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for keys in node.comp_types.keys():
-            if keys not in self.added:
-                hop_nodes.add(keys)
-        for c in node.comp_types:
-            if c not in self.added:
-                hop_nodes.add(c)
-            hop_edges.append(_dashed_edge(node, c, colour, node.comp_types[c]))
+        for c in node.sorted_view("comp_types"):
+            if id(c) not in self._added_ids:
+                hop_nodes[c] = None
+            hop_edges.append(Edge(node, c, "dashed", colour, node.comp_types[c]))
         if node.ancestor:
-            if node.ancestor not in self.added:
-                hop_nodes.add(node.ancestor)
-            hop_edges.append(_solid_edge(node, node.ancestor, colour))
-
-    def _extra_attributes(self):
-        self.dot.attr("graph", size="11.875,1000.0")
+            if id(node.ancestor) not in self._added_ids:
+                hop_nodes[node.ancestor] = None
+            hop_edges.append(Edge(node, node.ancestor, "solid", colour))
 
 
 class InheritsGraph(FortranGraph):
     """Graphs types that this type inherits from"""
 
+    __slots__ = ()
+
     _should_add_nested_nodes = True
-    _legend = TYPE_GRAPH_KEY
+    _legend = "type"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for c in node.comp_types:
-            if c not in self.added:
-                hop_nodes.add(c)
-            hop_edges.append(_dashed_edge(node, c, colour, node.comp_types[c]))
+        for c in node.sorted_view("comp_types"):
+            if id(c) not in self._added_ids:
+                hop_nodes[c] = None
+            hop_edges.append(Edge(node, c, "dashed", colour, node.comp_types[c]))
         if node.ancestor:
-            if node.ancestor not in self.added:
-                hop_nodes.add(node.ancestor)
-            hop_edges.append(_solid_edge(node, node.ancestor, colour))
+            if id(node.ancestor) not in self._added_ids:
+                hop_nodes[node.ancestor] = None
+            hop_edges.append(Edge(node, node.ancestor, "solid", colour))
 
 
 class InheritedByGraph(FortranGraph):
     """Graphs types that inherit this type"""
 
+    __slots__ = ()
+
     _should_add_nested_nodes = True
-    _legend = TYPE_GRAPH_KEY
+    _legend = "type"
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
         for c in node.comp_of:
-            if c not in self.added:
-                hop_nodes.add(c)
-            hop_edges.append(_dashed_edge(c, node, colour, node.comp_of[c]))
-        for c in node.children:
-            if c not in self.added:
-                hop_nodes.add(c)
-            hop_edges.append(_solid_edge(c, node, colour))
+            if id(c) not in self._added_ids:
+                hop_nodes[c] = None
+            hop_edges.append(Edge(c, node, "dashed", colour, node.comp_of[c]))
+        for c in node.sorted_view("children"):
+            if id(c) not in self._added_ids:
+                hop_nodes[c] = None
+            hop_edges.append(Edge(c, node, "solid", colour))
 
 
 class CallGraph(FortranGraph):
@@ -1219,72 +1480,69 @@ class CallGraph(FortranGraph):
     the nodes.
     """
 
+    __slots__ = ()
+
     RANKDIR = "LR"
-    _legend = CALL_GRAPH_KEY
+    _legend = "call"
+    GRAPH_ATTRIBUTES = {"size": "11.875,1000.0", "concentrate": "false"}
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for p in sorted(node.calls):
-            if p not in hop_nodes:
-                hop_nodes.add(p)
-            if getattr(node, "proctype", "") != "boundproc":
-                hop_edges.append(_solid_edge(node, p, colour))
-            else:
-                hop_edges.append(_dashed_edge(node, p, colour))
-        for p in sorted(getattr(node, "interfaces", [])):
-            if p not in hop_nodes:
-                hop_nodes.add(p)
-            hop_edges.append(_dashed_edge(node, p, colour))
-
-    def _extra_attributes(self):
-        self.dot.attr("graph", size="11.875,1000.0")
-        self.dot.attr("graph", concentrate="false")
+        # Bound procedures are drawn with dashed edges to what they bind to
+        style = "dashed" if getattr(node, "proctype", "") == "boundproc" else "solid"
+        for p in node.sorted_view("calls"):
+            if id(p) not in self._added_ids:
+                hop_nodes[p] = None
+            hop_edges.append(Edge(node, p, style, colour))
+        for p in node.sorted_view("interfaces"):
+            if id(p) not in self._added_ids:
+                hop_nodes[p] = None
+            hop_edges.append(Edge(node, p, "dashed", colour))
 
 
 class CallsGraph(FortranGraph):
     """Graphs procedures that this procedure calls"""
 
+    __slots__ = ()
+
     RANKDIR = "LR"
     _should_add_nested_nodes = True
-    _legend = CALL_GRAPH_KEY
+    _legend = "call"
+    GRAPH_ATTRIBUTES = {"concentrate": "false"}
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
-        for p in sorted(node.calls):
-            if p not in self.added:
-                hop_nodes.add(p)
-            if getattr(node, "proctype", "") != "boundproc":
-                hop_edges.append(_solid_edge(node, p, colour))
-            else:
-                hop_edges.append(_dashed_edge(node, p, colour))
-        for p in sorted(getattr(node, "interfaces", [])):
-            if p not in self.added:
-                hop_nodes.add(p)
-            hop_edges.append(_dashed_edge(node, p, colour))
-
-    def _extra_attributes(self):
-        self.dot.attr("graph", concentrate="false")
+        # Bound procedures are drawn with dashed edges to what they bind to
+        style = "dashed" if getattr(node, "proctype", "") == "boundproc" else "solid"
+        for p in node.sorted_view("calls"):
+            if id(p) not in self._added_ids:
+                hop_nodes[p] = None
+            hop_edges.append(Edge(node, p, style, colour))
+        for p in node.sorted_view("interfaces"):
+            if id(p) not in self._added_ids:
+                hop_nodes[p] = None
+            hop_edges.append(Edge(node, p, "dashed", colour))
 
 
 class CalledByGraph(FortranGraph):
     """Graphs procedures called by this procedure"""
 
+    __slots__ = ()
+
     RANKDIR = "LR"
     _should_add_nested_nodes = True
-    _legend = CALL_GRAPH_KEY
+    _legend = "call"
+    GRAPH_ATTRIBUTES = {"concentrate": "false"}
 
     def _add_node(self, hop_nodes, hop_edges, node, colour):
         if isinstance(node, ProgNode):
             return
-        for p in sorted(node.called_by):
-            if p not in self.added:
-                hop_nodes.add(p)
-            hop_edges.append(_solid_edge(p, node, colour))
-        for p in sorted(getattr(node, "interfaced_by", [])):
-            if p not in self.added:
-                hop_nodes.add(p)
-            hop_edges.append(_dashed_edge(p, node, colour))
-
-    def _extra_attributes(self):
-        self.dot.attr("graph", concentrate="false")
+        for p in node.sorted_view("called_by"):
+            if id(p) not in self._added_ids:
+                hop_nodes[p] = None
+            hop_edges.append(Edge(p, node, "solid", colour))
+        for p in node.sorted_view("interfaced_by"):
+            if id(p) not in self._added_ids:
+                hop_nodes[p] = None
+            hop_edges.append(Edge(p, node, "dashed", colour))
 
 
 class BadType(Exception):
@@ -1300,14 +1558,81 @@ class BadType(Exception):
         return repr(self.value)
 
 
-def outputFuncWrap(args):
+# Start of each SVG document when dot is given several graphs at once
+SVG_START_RE = re.compile(rb"(?=<\?xml )")
+
+# Number of graphs to give to each call to dot when saving graphs
+GRAPHS_PER_DOT_CALL = 32
+
+
+def _create_image_files(graphs: List[Tuple[Digraph, pathlib.Path]]) -> None:
+    """Save the SVG and DOT source of each graph to its ``filename``,
+    with ``.svg`` and ``.gv`` suffixes respectively.
+
+    Starting dot costs much more than most of our graphs take to lay
+    out, so all of ``graphs`` are rendered by a single call to dot,
+    which emits one SVG document per graph
+    """
+    if not graphs or not _graphviz_installed():
+        return
+
+    for dot, filename in graphs:
+        pathlib.Path(f"{filename}.gv").write_text(dot.source, encoding="utf-8")
+
+    source = "".join(dot.source for dot, _ in graphs)
+    svgs = SVG_START_RE.split(graphviz_pipe("dot", "svg", source.encode("utf-8")))
+    svgs = [svg for svg in svgs if svg]
+    if len(svgs) != len(graphs):
+        # Couldn't tell the documents apart, so render them one by one
+        svgs = [dot.pipe(format="svg") for dot, _ in graphs]
+
+    for (_, filename), svg in zip(graphs, svgs):
+        pathlib.Path(f"{filename}.svg").write_bytes(svg)
+
+
+def outputFuncWrap(
+    graphs: Iterable[Tuple[Digraph, str]], graphdir: pathlib.Path
+) -> None:
     """Wrapper function for output graphs -- needed to allow multiprocessing to
-    pickle the function (must be at top level)"""
+    pickle the function (must be at top level).
+
+    Each graph is passed as just its `Digraph` and file name: the
+    `FortranGraph` itself refers to the `GraphData` and, through that,
+    the whole project, all of which would be pickled for every task
+    """
+
+    _create_image_files([(dot, graphdir / imgfile) for dot, imgfile in graphs])
+
 
-    for f in args[0:-1]:
-        f.create_svg(args[-1])
+def render_graphs(graphs: Iterable[FortranGraph], njobs: int = 0) -> None:
+    """Render the SVG for each graph in ``graphs``, using ``njobs``
+    threads, or serially if ``njobs`` is 0.
 
-    return None
+    Rendering is mostly spent waiting on the ``dot`` subprocess, so
+    overlapping the calls in a pool of threads is enough to use
+    several processors. Each graph is submitted as soon as ``graphs``
+    produces it, so if it is a generator, later graphs are
+    constructed while earlier ones are rendering. Graphs that won't
+    show their SVG, such as empty ones, are skipped
+    """
+
+    graphs = (graph for graph in graphs if graph._needs_svg())
+
+    if njobs == 0:
+        for graph in tqdm(graphs, unit="", desc="Rendering graphs"):
+            graph.render()
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=njobs) as pool:
+        futures = [pool.submit(graph.render) for graph in graphs]
+        for future in tqdm(
+            concurrent.futures.as_completed(futures),
+            total=len(futures),
+            unit="",
+            desc="Rendering graphs",
+        ):
+            # Re-raise any errors from rendering
+            future.result()
 
 
 class GraphManager:
@@ -1374,65 +1699,112 @@ class GraphManager:
             self.data.register(obj)
             self.graph_objs.append(obj)
 
-    def graph_all(self):
-        """Create all graphs"""
-        for obj in tqdm(sorted(self.graph_objs), unit="", desc="Generating graphs"):
-            if is_module(obj):
-                obj.usesgraph = UsesGraph(obj, self.data)
-                obj.usedbygraph = UsedByGraph(obj, self.data)
-                self.modules.add(obj)
-            elif is_type(obj):
-                obj.inhergraph = InheritsGraph(obj, self.data)
-                obj.inherbygraph = InheritedByGraph(obj, self.data)
-                self.types.add(obj)
-                # register bound procedures that arn't simple bindings (bindings that bind one procedure to one label)
-                for bp in getattr(obj, "boundprocs", []):
-                    if not (
-                        len(bp.bindings) == 1
-                        and not isinstance(bp.bindings[0], FortranBoundProcedure)
-                    ):
-                        self.bound_procedures.add(bp)
-            elif is_proc(obj):
-                obj.callsgraph = CallsGraph(obj, self.data)
-                obj.calledbygraph = CalledByGraph(obj, self.data)
-                obj.usesgraph = UsesGraph(obj, self.data)
-                self.procedures.add(obj)
-                # regester internal procedures
-                for p in ford.utils.traverse(obj, ["subroutines", "functions"]):
-                    self.internal_procedures.add(p) if getattr(
-                        p, "visible", False
-                    ) else None
-            elif is_program(obj):
-                obj.usesgraph = UsesGraph(obj, self.data)
-                obj.callsgraph = CallsGraph(obj, self.data)
-                self.programs.add(obj)
-            elif is_sourcefile(obj):
-                obj.afferentgraph = AfferentGraph(obj, self.data)
-                obj.efferentgraph = EfferentGraph(obj, self.data)
-                self.sourcefiles.add(obj)
-            elif is_blockdata(obj):
-                obj.usesgraph = UsesGraph(obj, self.data)
-                self.blockdata.add(obj)
-
-        usenodes = sorted(list(self.modules))
-        callnodes = sorted(
-            list(self.procedures | self.internal_procedures | self.bound_procedures)
+    def graph_all(self, njobs: int = 0):
+        """Create all graphs, rendering them with ``njobs`` threads, or
+        serially if ``njobs`` is 0"""
+        render_graphs(self._make_graphs(), njobs)
+
+    def _make_graphs(self) -> Iterator[FortranGraph]:
+        """Create the graphs for each registered entity, and then the
+        graphs for all entities of each kind, yielding each graph once
+        it has been constructed"""
+
+        graph_objs = sorted(self.graph_objs, key=_by_ident)
+
+        # The type and file graphs only need the registered nodes, not
+        # the graphs of each entity, so make them first: they are among
+        # the biggest to lay out, and can then render alongside the rest
+        self.types.update(filter(is_type, graph_objs))
+        self.sourcefiles.update(filter(is_sourcefile, graph_objs))
+        self.typegraph = TypeGraph(self.types, self.data, "type~~graph")
+        self.filegraph = FileGraph(self.sourcefiles, self.data, "file~~graph")
+        yield from (self.typegraph, self.filegraph)
+
+        for obj in tqdm(graph_objs, unit="", desc="Generating graphs"):
+            yield from self._build_graphs_for(obj)
+
+        # FortranGraph sorts its root nodes, so these don't need to be
+        usenodes = list(self.modules)
+        callnodes = list(
+            self.procedures | self.internal_procedures | self.bound_procedures
         )
-        for p in sorted(self.programs):
+        for p in self.programs:
             if len(p.usesgraph.added) > 1:
                 usenodes.append(p)
             if len(p.callsgraph.added) > 1:
                 callnodes.append(p)
-        for p in sorted(self.procedures):
+        for p in self.procedures:
             if len(p.usesgraph.added) > 1:
                 usenodes.append(p)
         for b in self.blockdata:
             if len(b.usesgraph.added) > 1:
                 usenodes.append(b)
         self.usegraph = ModuleGraph(usenodes, self.data, "module~~graph")
-        self.typegraph = TypeGraph(self.types, self.data, "type~~graph")
         self.callgraph = CallGraph(callnodes, self.data, "call~~graph")
-        self.filegraph = FileGraph(self.sourcefiles, self.data, "file~~graph")
+        yield from (self.usegraph, self.callgraph)
+
+    def _build_graphs_for(self, obj: FortranContainer) -> List[FortranGraph]:
+        """Create the graphs for a single entity, attach them to
+        ``obj``, and return them"""
+        graphs: List[FortranGraph] = []
+        if is_module(obj):
+            obj.usesgraph = UsesGraph(obj, self.data)
+            obj.usedbygraph = UsedByGraph(obj, self.data)
+            graphs = [obj.usesgraph, obj.usedbygraph]
+            self.modules.add(obj)
+        elif is_type(obj):
+            obj.inhergraph = InheritsGraph(obj, self.data)
+            obj.inherbygraph = InheritedByGraph(obj, self.data)
+            graphs = [obj.inhergraph, obj.inherbygraph]
+            self.types.add(obj)
+            # register bound procedures that arn't simple bindings (bindings that bind one procedure to one label)
+            for bp in getattr(obj, "boundprocs", []):
+                if not (
+                    len(bp.bindings) == 1
+                    and not isinstance(bp.bindings[0], FortranBoundProcedure)
+                ):
+                    self.bound_procedures.add(bp)
+        elif is_proc(obj):
+            obj.callsgraph = CallsGraph(obj, self.data)
+            obj.calledbygraph = CalledByGraph(obj, self.data)
+            obj.usesgraph = UsesGraph(obj, self.data)
+            graphs = [obj.callsgraph, obj.calledbygraph, obj.usesgraph]
+            self.procedures.add(obj)
+            # regester internal procedures
+            for p in ford.utils.traverse(obj, ["subroutines", "functions"]):
+                self.internal_procedures.add(p) if getattr(
+                    p, "visible", False
+                ) else None
+        elif is_program(obj):
+            obj.usesgraph = UsesGraph(obj, self.data)
+            obj.callsgraph = CallsGraph(obj, self.data)
+            graphs = [obj.usesgraph, obj.callsgraph]
+            self.programs.add(obj)
+        elif is_sourcefile(obj):
+            obj.afferentgraph = AfferentGraph(obj, self.data)
+            obj.efferentgraph = EfferentGraph(obj, self.data)
+            graphs = [obj.afferentgraph, obj.efferentgraph]
+            self.sourcefiles.add(obj)
+        elif is_blockdata(obj):
+            obj.usesgraph = UsesGraph(obj, self.data)
+            graphs = [obj.usesgraph]
+            self.blockdata.add(obj)
+
+        return graphs
+
+    def _graphs_to_save(self) -> Iterator[FortranGraph]:
+        """The graphs for each entity that are saved to file"""
+        graphs = itertools.chain.from_iterable(
+            itertools.chain(
+                ((m.usesgraph, m.usedbygraph) for m in self.modules),
+                ((m.inhergraph, m.inherbygraph) for m in self.types),
+                ((m.callsgraph, m.calledbygraph) for m in self.procedures),
+                ((m.callsgraph, m.usesgraph) for m in self.programs),
+                ((m.afferentgraph, m.efferentgraph) for m in self.sourcefiles),
+                ((m.usesgraph,) for m in self.blockdata),
+            )
+        )
+        return filter(FortranGraph._has_image_file, graphs)
 
     def output_graphs(self, njobs=0):
         """Save graphs to file"""
@@ -1442,60 +1814,30 @@ class GraphManager:
 
         self.graphdir.mkdir(exist_ok=True, parents=True, mode=0o755)
 
+        # Counting the graphs is cheap, and lets the batches below be
+        # made as they are needed, rather than all up front
+        n_files = sum(1 for _ in self._graphs_to_save())
+        n_batches = -(-n_files // GRAPHS_PER_DOT_CALL)
+        # Only the DOT source and file name are needed to save each graph
+        files = ((g.dot, g.imgfile) for g in self._graphs_to_save())
+        batches = iter(lambda: list(itertools.islice(files, GRAPHS_PER_DOT_CALL)), [])
+        write_batch = functools.partial(outputFuncWrap, graphdir=self.graphdir)
+
         if njobs == 0:
-            for m in self.modules:
-                m.usesgraph.create_svg(self.graphdir)
-                m.usedbygraph.create_svg(self.graphdir)
-            for t in self.types:
-                t.inhergraph.create_svg(self.graphdir)
-                t.inherbygraph.create_svg(self.graphdir)
-            for p in self.procedures:
-                p.callsgraph.create_svg(self.graphdir)
-                p.calledbygraph.create_svg(self.graphdir)
-            for p in self.programs:
-                p.callsgraph.create_svg(self.graphdir)
-                p.usesgraph.create_svg(self.graphdir)
-            for f in self.sourcefiles:
-                f.afferentgraph.create_svg(self.graphdir)
-                f.efferentgraph.create_svg(self.graphdir)
-            for b in self.blockdata:
-                b.usesgraph.create_svg(self.graphdir)
+            for batch in batches:
+                write_batch(batch)
         else:
-            args = []
-            # Note we generate all graphs for a given object in one wrapper call
-            # this is to try to ensure we don't get name collisions not present
-            # in the serial version (e.g. due to calling usesgraph and usedbygraph on
-            # a particular module in two different processes). May not actually be needed
-            # commented block above allows testing of one graph per call approach.
-            args.extend(
-                [(m.usesgraph, m.usedbygraph, self.graphdir) for m in self.modules]
-            )
-            args.extend(
-                [(m.inhergraph, m.inherbygraph, self.graphdir) for m in self.types]
-            )
-            args.extend(
-                [
-                    (m.callsgraph, m.calledbygraph, self.graphdir)
-                    for m in self.procedures
-                ]
-            )
-            args.extend(
-                [(m.callsgraph, m.usesgraph, self.graphdir) for m in self.programs]
-            )
-            args.extend(
-                [
-                    (m.afferentgraph, m.efferentgraph, self.graphdir)
-                    for m in self.sourcefiles
-                ]
-            )
-            args.extend([(m.usesgraph, self.graphdir) for m in self.blockdata])
-
-            process_map(
-                outputFuncWrap,
-                args,
-                max_workers=njobs,
-                desc="Writing graphs",
-            )
+            # Send several batches to a worker at a time when there are
+            # many of them, while still giving each worker plenty of tasks
+            chunksize = max(1, n_batches // (njobs * 16))
+            with multiprocessing.Pool(njobs) as pool:
+                for _ in tqdm(
+                    pool.imap_unordered(write_batch, batches, chunksize=chunksize),
+                    total=n_batches,
+                    unit="",
+                    desc="Writing graphs",
+                ):
+                    pass
 
         for graph in [self.usegraph, self.typegraph, self.callgraph, self.filegraph]:
             if graph:
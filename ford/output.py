@@ -33,10 +33,11 @@ import jinja2
 
 from tqdm import tqdm
 
+import ford.graphs
 import ford.sourceform
 import ford.tipue_search
 import ford.utils
-from ford.graphs import graphviz_installed, GraphManager
+from ford.graphs import GraphManager
 
 loc = pathlib.Path(__file__).parent
 env = jinja2.Environment(
@@ -97,7 +98,7 @@ class Documentation:
 
         self.index = IndexPage(self.data, project, proj_docs)
         self.search = SearchPage(self.data, project)
-        if not graphviz_installed and data["graph"]:
+        if not ford.graphs.graphviz_installed and data["graph"]:
             print(
                 "Warning: Will not be able to generate graphs. Graphviz not installed."
             )
@@ -165,7 +166,7 @@ class Documentation:
             save_graphs=bool(self.data.get("graph_dir", False)),
         )
 
-        if graphviz_installed and data["graph"]:
+        if ford.graphs.graphviz_installed and data["graph"]:
             for entity_list in [
                 project.types,
                 project.procedures,
@@ -179,7 +180,7 @@ class Documentation:
                 for item in entity_list:
                     self.graphs.register(item)
 
-            self.graphs.graph_all()
+            self.graphs.graph_all(self.njobs)
             project.callgraph = self.graphs.callgraph
             project.typegraph = self.graphs.typegraph
             project.usegraph = self.graphs.usegraph
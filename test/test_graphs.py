@@ -1,12 +1,27 @@
 from ford.fortran_project import Project
 from ford import DEFAULT_SETTINGS
-from ford.graphs import graphviz_installed, GraphManager
+from ford.graphs import (
+    graphviz_installed,
+    _dot_edge_statement,
+    Edge,
+    GraphData,
+    GraphManager,
+    HYPERLINK_RE,
+    ModNode,
+    ModuleGraph,
+    rainbowcolour,
+    render_graphs,
+    UsesGraph,
+)
+import ford.graphs
 import ford.sourceform
 
 from copy import deepcopy
+import time
 from textwrap import dedent
 from typing import Dict
 
+from graphviz import Digraph
 import markdown
 import pytest
 from bs4 import BeautifulSoup
@@ -471,7 +486,122 @@ def test_graphs(
     assert legend.find_all("g", class_="edge") == []
 
 
-def test_graphs_as_table(tmp_path):
+def all_graphs(graphs: GraphManager) -> list:
+    """Every graph created by ``graphs``, both overall and per entity"""
+    graph_names = [
+        "usesgraph",
+        "usedbygraph",
+        "inhergraph",
+        "inherbygraph",
+        "callsgraph",
+        "calledbygraph",
+        "afferentgraph",
+        "efferentgraph",
+    ]
+    result = [graphs.usegraph, graphs.typegraph, graphs.callgraph, graphs.filegraph]
+    for collection in (
+        graphs.modules,
+        graphs.types,
+        graphs.procedures,
+        graphs.programs,
+        graphs.sourcefiles,
+    ):
+        for entity in collection:
+            result.extend(
+                getattr(entity, name) for name in graph_names if hasattr(entity, name)
+            )
+    return result
+
+
+@pytest.mark.skipif(not graphviz_installed, reason="Requires graphviz")
+@pytest.mark.parametrize("project", ["make_project_graphs", "make_table_graphs"])
+def test_only_shown_graphs_rendered(project, request):
+    graphs = request.getfixturevalue(project)
+
+    for graph in all_graphs(graphs):
+        rendered = graph.svg_src is not None
+        assert rendered == graph._needs_svg(), graph.ident
+        str(graph)
+        # Building the HTML doesn't render anything else
+        assert (graph.svg_src is not None) == rendered, graph.ident
+
+
+@pytest.mark.skipif(not graphviz_installed, reason="Requires graphviz")
+def test_table_graphs_not_rendered(make_table_graphs):
+    graphs = make_table_graphs
+
+    for graph in graphs.procedures:
+        if graph.name == "one":
+            break
+    graph = graph.calledbygraph
+
+    assert not graph._needs_svg()
+    assert "<table" in str(graph)
+    assert graph.svg_src is None
+
+
+@pytest.mark.skipif(not graphviz_installed, reason="Requires graphviz")
+def test_serial_rendering_has_no_pool(make_project_graphs, monkeypatch):
+    graphs = make_project_graphs
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("Pool created for serial rendering")
+
+    monkeypatch.setattr(ford.graphs.concurrent.futures, "ThreadPoolExecutor", no_pool)
+
+    modules = sorted(graphs.modules)
+    new_graphs = [ModuleGraph(modules, graphs.data)]
+    new_graphs.extend(UsesGraph(module, graphs.data) for module in modules)
+    render_graphs(new_graphs, njobs=0)
+
+    assert any(graph._needs_svg() for graph in new_graphs)
+    for graph in new_graphs:
+        assert (graph.svg_src is not None) == graph._needs_svg(), graph.ident
+
+
+def test_no_duplicate_edges(make_project_graphs):
+    for graph in all_graphs(make_project_graphs):
+        edges = [line for line in graph.dot.body if "->" in line]
+        assert len(edges) == len(set(edges)), graph.ident
+
+
+def test_no_duplicate_nodes(make_project_graphs):
+    for graph in all_graphs(make_project_graphs):
+        nodes = [line for line in graph.dot.body if "->" not in line]
+        assert len(nodes) == len(set(nodes)), graph.ident
+
+
+def test_graph_root_generator(make_project_graphs):
+    graphs = make_project_graphs
+
+    modules = sorted(graphs.modules)
+    from_list = ModuleGraph(modules, graphs.data)
+    from_generator = ModuleGraph((module for module in modules), graphs.data)
+
+    assert from_generator.ident == from_list.ident
+    assert from_generator.dot.source == from_list.dot.source
+
+
+@pytest.mark.skipif(not graphviz_installed, reason="Requires graphviz")
+def test_output_graphs(make_project_graphs, tmp_path, monkeypatch):
+    graphs = make_project_graphs
+    monkeypatch.setattr(graphs, "save_graphs", True)
+
+    expected = {f"{graph.imgfile}.svg" for graph in graphs._graphs_to_save()}
+    expected |= {
+        f"{graph.imgfile}.svg"
+        for graph in (graphs.usegraph, graphs.typegraph, graphs.callgraph)
+    }
+
+    for njobs in (0, 2):
+        monkeypatch.setattr(graphs, "graphdir", tmp_path / f"njobs_{njobs}")
+        graphs.output_graphs(njobs)
+        written = {path.name for path in graphs.graphdir.glob("*.svg")}
+        assert written == expected
+
+
+@pytest.fixture
+def make_table_graphs(tmp_path):
     data = """\
     program foo
     contains
@@ -536,6 +666,11 @@ def test_graphs_as_table(tmp_path):
 
     graphs.graph_all()
     graphs.output_graphs(0)
+    return graphs
+
+
+def test_graphs_as_table(make_table_graphs):
+    graphs = make_table_graphs
 
     for graph in graphs.procedures:
         if graph.name == "one":
@@ -562,3 +697,82 @@ def test_graphs_as_table(tmp_path):
     assert node_names == expected_node_names
     assert num_arrows == len(expected_node_names)
     assert num_ws == len(expected_node_names)
+
+
+def test_sorted_view_updates_when_collection_grows():
+    data = GraphData("", coloured_edges=False, show_proc_parent=False)
+    module_a = data.get_node(ford.sourceform.ExternalModule("a"))
+    module_b = data.get_node(ford.sourceform.ExternalModule("b"))
+    module_c = data.get_node(ford.sourceform.ExternalModule("c"))
+
+    module_a.used_by.add(module_c)
+    assert module_a.sorted_view("used_by") == (module_c,)
+
+    module_a.used_by.add(module_b)
+    assert module_a.sorted_view("used_by") == (module_b, module_c)
+
+    # Procedures don't have children
+    procedure = data.get_node(ford.sourceform.ExternalSubroutine("proc"))
+    assert procedure.sorted_view("children") == ()
+
+
+def test_rainbowcolour_distinct():
+    colours = [rainbowcolour(i, 10) for i in range(10)]
+    assert len(set(colours)) == len(colours)
+    assert rainbowcolour(0, 10) == rainbowcolour(0, 1)
+
+
+def test_external_entities_share_node():
+    data = GraphData("", coloured_edges=False, show_proc_parent=False)
+    assert data.get_module_node("external_mod") is data.get_module_node("external_mod")
+    assert data.get_type_node("external_type", {}) is data.get_type_node(
+        "external_type", {}
+    )
+    assert data.get_procedure_node("external_proc", {}) is data.get_procedure_node(
+        "external_proc", {}
+    )
+
+
+@pytest.mark.parametrize(
+    ("text", "name", "url"),
+    [
+        ("<a href='mod.html'>mod</a>", "mod", "mod.html"),
+        ('< A class="x" HREF="proc.html" >proc</a >', "proc", "proc.html"),
+        ("<a href='mod.html'>mod", "<a href='mod.html'>mod", None),
+        ('<a href="x.html"><code>foo</code>bar</a>', "bar", "x.html"),
+        # As before, only text after any markup in the link is kept
+        ('<a href="x.html"><code>foo</code></a>', "", "x.html"),
+        ('<a href="x.html">foo<bar</a>', "foo<bar", "x.html"),
+        ("<a class='x'>foo</a>", "<a class='x'>foo</a>", None),
+    ],
+)
+def test_node_from_hyperlink(text, name, url):
+    data = GraphData("", coloured_edges=False, show_proc_parent=False)
+    node = ModNode(text, data)
+    assert node.name == name
+    assert node.url == url
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "<a" + " " * 50_000,
+        "<a " + 'href="x" ' * 50_000,
+        "<a href='x'>" + "</a " * 50_000,
+        "<a href='x'>" + "<" * 50_000 + "</a",
+    ],
+)
+def test_hyperlink_re_linear(text):
+    start = time.perf_counter()
+    HYPERLINK_RE.match(text)
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize("tail, head", [("a", "b"), ("a:b", "c::d"), ("a b", "c:n")])
+def test_edge_statement_matches_graphviz(tail, head):
+    data = GraphData("", coloured_edges=False, show_proc_parent=False)
+    edge = Edge(ModNode(tail, data), ModNode(head, data), "dashed", "#000000")
+
+    dot = Digraph()
+    dot.edge(tail, head, color="#000000", style="dashed")
+    assert _dot_edge_statement(edge) == dot.body[-1]